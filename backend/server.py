@@ -1,12 +1,36 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import Response, FileResponse
+from fastapi import FastAPI, APIRouter, Request, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+import aiofiles
+import asyncio
+import orjson
 import os
 import logging
+import struct
 import zipfile
+import zlib
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# Optional libdeflate bindings: PCLMULQDQ-accelerated CRC32 and a
+# ~2-3x faster single-shot inflate when present
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+# Optional ISA-L bindings: second-choice accelerated inflate
+try:
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+_crc32 = deflate.crc32 if deflate is not None else zlib.crc32
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
@@ -26,8 +50,76 @@ db = client[os.environ['DB_NAME']]
 UPLOAD_DIR = ROOT_DIR / 'uploads'
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Parallel extraction: only worth the process startup cost for larger archives
+PARALLEL_EXTRACT_THRESHOLD = 32 * 1024 * 1024
+EXTRACT_WORKERS = min(os.cpu_count() or 1, 4)
+
+# Shared extraction pool, created lazily on the first large upload so
+# worker startup is paid once per process rather than per request
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    global _EXTRACT_POOL
+    if _EXTRACT_POOL is None:
+        _EXTRACT_POOL = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _EXTRACT_POOL
+
+# Chunk size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Text files above this size are streamed instead of JSON-framed
+LARGE_TEXT_THRESHOLD = 1024 * 1024
+
+# Fast-path MIME table for the common frontend asset extensions; one
+# dict hit instead of mimetypes.guess_type's URL parsing. Anything not
+# listed falls back to guess_type.
+EXT_TO_MIME = {
+    '.html': 'text/html',
+    '.htm': 'text/html',
+    '.js': 'application/javascript',
+    '.mjs': 'application/javascript',
+    '.css': 'text/css',
+    '.json': 'application/json',
+    '.map': 'application/json',
+    '.xml': 'application/xml',
+    '.txt': 'text/plain',
+    '.md': 'text/markdown',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf',
+    '.otf': 'font/otf',
+    '.eot': 'application/vnd.ms-fontobject',
+    '.wasm': 'application/wasm',
+    '.pdf': 'application/pdf',
+    '.mp3': 'audio/mpeg',
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.zip': 'application/zip',
+}
+
+# Known app ids, kept in memory so the file-serving hot path can skip
+# the Mongo round-trip; loaded at startup, updated on upload/delete
+KNOWN_APPS: set = set()
+
+# app_id -> realpath of its upload directory, so per-request traversal
+# checks are pure string work instead of resolve() syscall chains
+RESOLVED_DIRS: dict = {}
+
+# Metadata inserts from concurrent uploads are coalesced into a single
+# insert_many by a background flusher task
+INSERT_QUEUE: asyncio.Queue = asyncio.Queue()
+INSERT_BATCH_WINDOW = 0.02
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -43,6 +135,7 @@ class AppMetadata(BaseModel):
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     file_count: int = 0
     size_bytes: int = 0
+    tree: Optional[dict] = None
 
 class AppResponse(BaseModel):
     id: str
@@ -63,23 +156,29 @@ class FileNode(BaseModel):
 
 FileNode.model_rebuild()
 
+# Projection matching AppResponse exactly, so Mongo only decodes the
+# fields the API returns
+APP_RESPONSE_PROJECTION = {"_id": 0, **{field: 1 for field in AppResponse.model_fields}}
+
+# Signature package -> framework name, in priority order
+FRAMEWORKS = {
+    'react': 'React',
+    'vue': 'Vue',
+    'svelte': 'Svelte',
+    '@angular/core': 'Angular',
+}
+
 def detect_framework(app_dir: Path) -> Optional[str]:
     """Detect the frontend framework used in the project."""
     package_json = app_dir / 'package.json'
     if package_json.exists():
-        import json
         try:
-            with open(package_json) as f:
-                pkg = json.load(f)
-                deps = {**pkg.get('dependencies', {}), **pkg.get('devDependencies', {})}
-                if 'react' in deps:
-                    return 'React'
-                elif 'vue' in deps:
-                    return 'Vue'
-                elif 'svelte' in deps:
-                    return 'Svelte'
-                elif '@angular/core' in deps:
-                    return 'Angular'
+            pkg = orjson.loads(package_json.read_bytes())
+            deps = pkg.get('dependencies') or {}
+            dev_deps = pkg.get('devDependencies') or {}
+            for dep, framework in FRAMEWORKS.items():
+                if dep in deps or dep in dev_deps:
+                    return framework
         except:
             pass
     
@@ -105,22 +204,270 @@ def find_entry_file(app_dir: Path) -> str:
     
     return "index.html"
 
-def get_dir_size(path: Path) -> int:
-    """Calculate total size of directory."""
-    total = 0
-    for file in path.rglob('*'):
-        if file.is_file():
-            total += file.stat().st_size
-    return total
+# Files the detection helpers read; extracted first so detection can
+# start while the rest of the archive is still decompressing
+DETECTION_FILES = ('package.json', 'index.html')
 
-def count_files(path: Path) -> int:
-    """Count total files in directory."""
-    return sum(1 for f in path.rglob('*') if f.is_file())
+def _detect_metadata(app_dir: Path):
+    """Run framework and entry-file detection; runs in a worker thread."""
+    return detect_framework(app_dir), find_entry_file(app_dir)
+
+def _single_subdir(path: Path) -> Optional[Path]:
+    """Return path's lone subdirectory, if that is all it contains."""
+    entries = list(path.iterdir())
+    if len(entries) == 1 and entries[0].is_dir():
+        return entries[0]
+    return None
+
+def _scandir_recursive(path):
+    """Yield DirEntry objects for all files under path, recursively.
+
+    Uses os.scandir so file type and stat info come from the directory
+    read itself instead of an extra stat() per entry.
+    """
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scandir_recursive(entry.path)
+                else:
+                    yield entry
+    except PermissionError:
+        pass
+
+def walk_stats(path: Path):
+    """Walk a directory once, returning (file_count, total_size, tree).
+
+    Fuses the size/count accumulation and the FileNode tree build into a
+    single scandir pass so the upload tree is only read from disk once.
+    Hidden entries and node_modules are counted but left out of the tree,
+    matching the old separate helpers.
+    """
+    def _walk(dir_path: str, rel_path: str, in_tree: bool):
+        count = 0
+        size = 0
+        children = [] if in_tree else None
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: (e.is_file(), e.name.lower()))
+        except PermissionError:
+            entries = []
+        for entry in entries:
+            child_in_tree = in_tree and not (entry.name.startswith('.') or entry.name == 'node_modules')
+            child_rel = f"{rel_path}/{entry.name}" if rel_path != '.' else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                sub_count, sub_size, node = _walk(entry.path, child_rel, child_in_tree)
+                count += sub_count
+                size += sub_size
+                if node is not None:
+                    children.append(node)
+            else:
+                count += 1
+                entry_size = entry.stat().st_size
+                size += entry_size
+                if child_in_tree:
+                    children.append(FileNode(
+                        name=entry.name,
+                        path=child_rel,
+                        type='file',
+                        size=entry_size
+                    ))
+        node = None
+        if in_tree:
+            node = FileNode(
+                name=os.path.basename(dir_path),
+                path=rel_path,
+                type='directory',
+                children=children
+            )
+        return count, size, node
+
+    return _walk(str(path), '.', True)
+
+def _app_root(app_id: str) -> str:
+    """Return the resolved upload directory for an app, caching it."""
+    root = RESOLVED_DIRS.get(app_id)
+    if root is None:
+        root = RESOLVED_DIRS.setdefault(app_id, os.path.realpath(UPLOAD_DIR / app_id))
+    return root
+
+@lru_cache(maxsize=4096)
+def _resolve(app_id: str, file_path: str):
+    """Resolve a requested path inside an app's upload directory.
+
+    Returns (resolved_path, content_type). Raises 403 if the path
+    escapes the app directory; the traversal guard is a normpath prefix
+    check against the cached directory realpath, so no syscalls are
+    made. App contents are immutable after upload, so the result is
+    memoized per (app_id, file_path); delete_app clears the cache.
+    """
+    root = _app_root(app_id)
+
+    # Security check - prevent directory traversal
+    candidate = os.path.normpath(os.path.join(root, file_path))
+    if candidate != root and not candidate.startswith(root + os.sep):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    file_full_path = Path(candidate)
+    content_type = (EXT_TO_MIME.get(file_full_path.suffix.lower())
+                    or mimetypes.guess_type(str(file_full_path))[0])
+    return file_full_path, content_type
+
+async def _aiter_text(path: Path, chunk_size: int):
+    """Yield a file's contents in chunks for a StreamingResponse."""
+    async with aiofiles.open(path, 'rb') as f:
+        while chunk := await f.read(chunk_size):
+            yield chunk
+
+def _inject_base_tags(app_dir: Path, app_id: str):
+    """Inject a <base> tag into every HTML file, once at upload time.
+
+    Relative asset paths then resolve correctly when the file is served
+    straight off disk, so serve_app_file never rewrites HTML per request
+    and can return a plain FileResponse. Idempotent: files that already
+    carry the tag are left alone, so the startup migration can re-run it
+    safely. Files that aren't valid UTF-8 are skipped rather than
+    rewritten lossily.
+    """
+    base_url = f"/api/apps/{app_id}/serve/"
+    base_tag = f'<base href="{base_url}">'
+    for entry in _scandir_recursive(app_dir):
+        if not entry.name.lower().endswith(('.html', '.htm')):
+            continue
+        try:
+            with open(entry.path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            continue
+        try:
+            content = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            continue
+        if base_tag in content:
+            continue
+        if '<head>' in content:
+            content = content.replace('<head>', f'<head>{base_tag}')
+        elif '<HEAD>' in content:
+            content = content.replace('<HEAD>', f'<HEAD>{base_tag}')
+        else:
+            content = base_tag + content
+        with open(entry.path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+def _read_raw_entry(zf: zipfile.ZipFile, zi: zipfile.ZipInfo) -> bytes:
+    """Read an entry's compressed bytes straight from its local header."""
+    fp = zf.fp
+    fp.seek(zi.header_offset)
+    header = fp.read(30)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    fp.seek(zi.header_offset + 30 + name_len + extra_len)
+    return fp.read(zi.compress_size)
+
+def _inflate(raw: bytes, file_size: int) -> bytes:
+    """Decompress a raw DEFLATE stream with the fastest available inflater."""
+    if deflate is not None and file_size:
+        # libdeflate needs the exact output size up front
+        return deflate.deflate_decompress(raw, file_size)
+    if isal_zlib is not None:
+        return isal_zlib.decompress(raw, -zlib.MAX_WBITS, file_size or zlib.DEF_BUF_SIZE)
+    return zlib.decompress(raw, -zlib.MAX_WBITS, file_size or zlib.DEF_BUF_SIZE)
+
+def _extract_entry(zf: zipfile.ZipFile, name: str, dest: str):
+    """Extract one entry, checking its CRC in a single pass.
+
+    Reads the raw compressed bytes, inflates them as one buffer, and
+    verifies the CRC with one C call over the result instead of the
+    incremental per-read-chunk CRC updates inside ZipExtFile. Entries
+    using compression methods other than store/deflate fall back to
+    zipfile's own extract.
+    """
+    target = os.path.normpath(os.path.join(dest, name))
+    if not target.startswith(os.path.normpath(dest) + os.sep):
+        # Odd path (absolute or ..): let zipfile sanitize it
+        zf.extract(name, dest)
+        return
+    zi = zf.getinfo(name)
+    if zi.compress_type == zipfile.ZIP_DEFLATED:
+        data = _inflate(_read_raw_entry(zf, zi), zi.file_size)
+    elif zi.compress_type == zipfile.ZIP_STORED:
+        data = _read_raw_entry(zf, zi)
+    else:
+        zf.extract(name, dest)
+        return
+    if _crc32(data) & 0xFFFFFFFF != zi.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for file {name!r}")
+    with open(target, 'wb') as f:
+        f.write(data)
+
+def _extract_slice(zip_path: str, dest: str, names: List[str]):
+    """Extract a slice of entries from a ZIP; runs in a worker process.
+
+    Each worker opens its own ZipFile handle so reads are independent
+    positional reads on separate file descriptors.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for name in names:
+            _extract_entry(zf, name, dest)
+
+def _prepare_extract(zip_path: str, dest: str, names: Optional[List[str]]) -> Optional[List[str]]:
+    """Read the central directory and set up extraction; runs in a thread.
+
+    Small archives are extracted here directly and None is returned.
+    For large ones all directories are pre-created and the list of file
+    entries to hand to the worker pool is returned instead.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+        if names is not None:
+            wanted = set(names)
+            infos = [zi for zi in infos if zi.filename in wanted]
+        total_size = sum(zi.file_size for zi in infos)
+
+        if total_size <= PARALLEL_EXTRACT_THRESHOLD or EXTRACT_WORKERS < 2:
+            zip_ref.extractall(dest, members=[zi.filename for zi in infos])
+            return None
+
+        # Pre-create all directories up front so workers never race on
+        # mkdir. Archive names can legally be absolute or contain ..
+        # segments, and joining those would land outside dest, so any
+        # entry that escapes is skipped here and left to zipfile's
+        # sanitizing extract fallback in the worker.
+        root = os.path.normpath(dest)
+        for zi in infos:
+            target = os.path.normpath(os.path.join(root, zi.filename))
+            if target != root and not target.startswith(root + os.sep):
+                continue
+            dir_path = target if zi.is_dir() else os.path.dirname(target)
+            os.makedirs(dir_path, exist_ok=True)
+
+        return [zi.filename for zi in infos if not zi.is_dir()]
+
+async def extract_zip(zip_path: Path, dest: Path, names: Optional[List[str]] = None):
+    """Extract a ZIP archive, fanning entries out across CPU cores.
+
+    Large archives are split into per-worker slices so DEFLATE
+    decompression overlaps across cores; small archives use plain
+    extractall to avoid process startup overhead. When names is given,
+    only those entries are extracted. All blocking work runs off the
+    event loop.
+    """
+    pending = await asyncio.to_thread(_prepare_extract, str(zip_path), str(dest), names)
+    if pending is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = _get_extract_pool()
+    await asyncio.gather(*(
+        loop.run_in_executor(
+            pool, _extract_slice, str(zip_path), str(dest), pending[i::EXTRACT_WORKERS]
+        )
+        for i in range(EXTRACT_WORKERS)
+    ))
 
 def build_file_tree(path: Path, base_path: Path) -> FileNode:
     """Build a file tree structure for the given path."""
     rel_path = str(path.relative_to(base_path))
-    
+
     if path.is_file():
         return FileNode(
             name=path.name,
@@ -128,17 +475,28 @@ def build_file_tree(path: Path, base_path: Path) -> FileNode:
             type='file',
             size=path.stat().st_size
         )
-    
+
     children = []
     try:
-        for child in sorted(path.iterdir(), key=lambda x: (x.is_file(), x.name.lower())):
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: (e.is_file(), e.name.lower()))
+        for entry in entries:
             # Skip hidden files and node_modules
-            if child.name.startswith('.') or child.name == 'node_modules':
+            if entry.name.startswith('.') or entry.name == 'node_modules':
                 continue
-            children.append(build_file_tree(child, base_path))
+            child_rel = f"{rel_path}/{entry.name}" if rel_path != '.' else entry.name
+            if entry.is_file():
+                children.append(FileNode(
+                    name=entry.name,
+                    path=child_rel,
+                    type='file',
+                    size=entry.stat().st_size
+                ))
+            else:
+                children.append(build_file_tree(Path(entry.path), base_path))
     except PermissionError:
         pass
-    
+
     return FileNode(
         name=path.name,
         path=rel_path,
@@ -146,11 +504,50 @@ def build_file_tree(path: Path, base_path: Path) -> FileNode:
         children=children
     )
 
+async def _insert_flusher():
+    """Batch app metadata inserts to amortize Mongo round-trips.
+
+    Waits for one document, then briefly collects any others that arrive
+    within the batch window so bursts of concurrent uploads share a
+    single insert_many; a lone upload still goes out as insert_one.
+    """
+    while True:
+        batch = [await INSERT_QUEUE.get()]
+        if INSERT_QUEUE.empty():
+            await asyncio.sleep(INSERT_BATCH_WINDOW)
+        while not INSERT_QUEUE.empty():
+            batch.append(INSERT_QUEUE.get_nowait())
+        try:
+            if len(batch) == 1:
+                await db.apps.insert_one(batch[0][0])
+            else:
+                await db.apps.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            # An unordered bulk write still inserts the non-failing
+            # documents, so only fail the futures whose docs were
+            # actually rejected and resolve the rest normally
+            failed = {err['index'] for err in e.details.get('writeErrors', [])}
+            for i, (_, done) in enumerate(batch):
+                if done.done():
+                    continue
+                if i in failed:
+                    done.set_exception(e)
+                else:
+                    done.set_result(None)
+        except Exception as e:
+            for _, done in batch:
+                if not done.done():
+                    done.set_exception(e)
+        else:
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(None)
+
 @api_router.get("/")
 async def root():
     return {"message": "Frontend Project Previewer API"}
 
-@api_router.post("/apps/upload", response_model=AppResponse)
+@api_router.post("/apps/upload")
 async def upload_app(file: UploadFile = File(...), name: Optional[str] = None):
     """Upload a ZIP file containing a frontend project."""
     if not file.filename.endswith('.zip'):
@@ -158,74 +555,112 @@ async def upload_app(file: UploadFile = File(...), name: Optional[str] = None):
     
     app_id = str(uuid.uuid4())
     app_dir = UPLOAD_DIR / app_id
-    
+    tmp_dir = UPLOAD_DIR / f"{app_id}.tmp"
+
     try:
-        # Save uploaded ZIP
+        # Stream uploaded ZIP to disk in chunks to keep memory bounded
         zip_path = UPLOAD_DIR / f"{app_id}.zip"
         with open(zip_path, 'wb') as f:
-            content = await file.read()
-            f.write(content)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
         
-        # Extract ZIP
-        app_dir.mkdir(exist_ok=True)
+        # Pipeline extraction with metadata detection: pull out the small
+        # files detection reads first, then let detection run in a thread
+        # while the bulk of the archive is still extracting. Extraction
+        # goes into a temp dir so the nested-folder fixup below is a
+        # single rename.
+        tmp_dir.mkdir(exist_ok=True)
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(app_dir)
-        
+            names = zip_ref.namelist()
+
+        priority = [n for n in names if n.rsplit('/', 1)[-1] in DETECTION_FILES]
+        if priority:
+            await extract_zip(zip_path, tmp_dir, priority)
+
+        # Point detection at what actually landed on disk; raw archive
+        # names can't be trusted for the single-top-level-folder case
+        # because extraction sanitizes them
+        detect_root = _single_subdir(tmp_dir) or tmp_dir
+        detection = asyncio.create_task(asyncio.to_thread(_detect_metadata, detect_root))
+
+        rest = [n for n in names if n.rsplit('/', 1)[-1] not in DETECTION_FILES]
+        await extract_zip(zip_path, tmp_dir, rest)
+        framework, entry_file = await detection
+
         # Remove ZIP file after extraction
         zip_path.unlink()
-        
-        # Handle nested folder (common in ZIP files)
-        subdirs = list(app_dir.iterdir())
-        if len(subdirs) == 1 and subdirs[0].is_dir():
-            nested_dir = subdirs[0]
-            # Move contents up one level
-            for item in nested_dir.iterdir():
-                shutil.move(str(item), str(app_dir / item.name))
-            nested_dir.rmdir()
-        
-        # Detect framework and entry file
-        framework = detect_framework(app_dir)
-        entry_file = find_entry_file(app_dir)
-        
+
+        # Promote the extracted tree into place: one rename handles the
+        # common ZIP-contains-one-folder case instead of moving every
+        # entry up a level. Nestedness is decided from the extracted
+        # directory itself, since raw archive names (./foo, absolute,
+        # ..) don't survive extraction verbatim.
+        nested_dir = _single_subdir(tmp_dir)
+        if nested_dir is not None:
+            os.rename(nested_dir, app_dir)
+            tmp_dir.rmdir()
+        else:
+            os.rename(tmp_dir, app_dir)
+
+        # Rewrite HTML once so serving never has to; done before the
+        # stats walk so recorded sizes match what is on disk
+        await asyncio.to_thread(_inject_base_tags, app_dir, app_id)
+
         # Get app name
         app_name = name or file.filename.replace('.zip', '')
-        
-        # Create metadata
+
+        # Collect size, count and file tree in a single walk, off the
+        # event loop so other requests keep running
+        file_count, size_bytes, tree = await asyncio.to_thread(walk_stats, app_dir)
+
+        # Create metadata; the tree is persisted alongside it so
+        # /apps/{id}/files never has to walk the directory again
         metadata = AppMetadata(
             id=app_id,
             name=app_name,
             framework=framework,
             entry_file=entry_file,
-            file_count=count_files(app_dir),
-            size_bytes=get_dir_size(app_dir)
+            file_count=file_count,
+            size_bytes=size_bytes,
+            tree=tree.model_dump()
         )
         
-        # Save to database
+        # Save to database via the batching flusher
         doc = metadata.model_dump()
-        await db.apps.insert_one(doc)
-        
-        return AppResponse(**doc)
+        done = asyncio.get_running_loop().create_future()
+        INSERT_QUEUE.put_nowait((doc, done))
+        await done
+        KNOWN_APPS.add(app_id)
+
+        # metadata was already validated on construction; return its
+        # response fields directly rather than round-tripping through
+        # AppResponse and the response_model validator
+        return {field: doc[field] for field in AppResponse.model_fields}
         
     except zipfile.BadZipFile:
-        if app_dir.exists():
-            shutil.rmtree(app_dir)
+        for leftover in (app_dir, tmp_dir):
+            if leftover.exists():
+                shutil.rmtree(leftover)
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
     except Exception as e:
-        if app_dir.exists():
-            shutil.rmtree(app_dir)
+        for leftover in (app_dir, tmp_dir):
+            if leftover.exists():
+                shutil.rmtree(leftover)
         logging.error(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/apps", response_model=List[AppResponse])
+@api_router.get("/apps")
 async def list_apps():
     """List all uploaded apps."""
-    apps = await db.apps.find({}, {"_id": 0}).to_list(1000)
-    return apps
+    # Covering projection plus orjson serialization; no response_model,
+    # so docs go straight from BSON decode to the wire without a
+    # Pydantic validation pass per app
+    return await db.apps.find({}, APP_RESPONSE_PROJECTION).to_list(1000)
 
 @api_router.get("/apps/{app_id}", response_model=AppResponse)
 async def get_app(app_id: str):
     """Get a single app's metadata."""
-    app = await db.apps.find_one({"id": app_id}, {"_id": 0})
+    app = await db.apps.find_one({"id": app_id}, APP_RESPONSE_PROJECTION)
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
     return app
@@ -233,7 +668,7 @@ async def get_app(app_id: str):
 @api_router.delete("/apps/{app_id}")
 async def delete_app(app_id: str):
     """Delete an uploaded app."""
-    app = await db.apps.find_one({"id": app_id})
+    app = await db.apps.find_one({"id": app_id}, {"_id": 0, "id": 1})
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
     
@@ -244,102 +679,97 @@ async def delete_app(app_id: str):
     
     # Delete from database
     await db.apps.delete_one({"id": app_id})
-    
+    KNOWN_APPS.discard(app_id)
+    RESOLVED_DIRS.pop(app_id, None)
+    _resolve.cache_clear()
+
     return {"message": "App deleted successfully"}
 
 @api_router.get("/apps/{app_id}/files")
 async def get_app_files(app_id: str):
     """Get the file structure of an uploaded app."""
-    app = await db.apps.find_one({"id": app_id}, {"_id": 0})
+    # id is projected alongside tree so documents predating the tree
+    # field still come back truthy and reach the walk fallback below
+    app = await db.apps.find_one({"id": app_id}, {"_id": 0, "id": 1, "tree": 1})
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
-    
+
+    # The tree is computed once at upload time and stored in the app
+    # document, so this is a single Mongo lookup instead of an O(files)
+    # directory walk
+    if app.get("tree") is not None:
+        return {"tree": app["tree"]}
+
     app_dir = UPLOAD_DIR / app_id
     if not app_dir.exists():
         raise HTTPException(status_code=404, detail="App files not found")
-    
+
+    # Fall back to walking for apps uploaded before trees were persisted
     tree = build_file_tree(app_dir, app_dir)
     return {"tree": tree.model_dump()}
 
 @api_router.get("/apps/{app_id}/serve/{file_path:path}")
-async def serve_app_file(app_id: str, file_path: str):
+async def serve_app_file(app_id: str, file_path: str, request: Request):
     """Serve a file from an uploaded app."""
-    app = await db.apps.find_one({"id": app_id}, {"_id": 0})
-    if not app:
+    if app_id not in KNOWN_APPS:
         raise HTTPException(status_code=404, detail="App not found")
-    
-    app_dir = UPLOAD_DIR / app_id
-    file_full_path = app_dir / file_path
-    
-    # Security check - prevent directory traversal
-    try:
-        file_full_path.resolve().relative_to(app_dir.resolve())
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+
+    file_full_path, content_type = _resolve(app_id, file_path)
+
     if not file_full_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
-    
+
     if file_full_path.is_dir():
         # Try to serve index.html from directory
-        index_file = file_full_path / 'index.html'
-        if index_file.exists():
-            file_full_path = index_file
+        if (file_full_path / 'index.html').exists():
+            file_full_path, content_type = _resolve(
+                app_id, str(Path(file_path) / 'index.html')
+            )
         else:
             raise HTTPException(status_code=404, detail="Directory listing not allowed")
-    
-    # Determine content type
-    content_type, _ = mimetypes.guess_type(str(file_full_path))
+
     if content_type is None:
         content_type = 'application/octet-stream'
-    
-    # Special handling for HTML files to fix relative paths
-    if content_type == 'text/html':
-        with open(file_full_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Inject base tag to handle relative paths
-        base_url = f"/api/apps/{app_id}/serve/"
-        if '<head>' in content:
-            content = content.replace('<head>', f'<head><base href="{base_url}">')
-        elif '<HEAD>' in content:
-            content = content.replace('<HEAD>', f'<HEAD><base href="{base_url}">')
-        else:
-            content = f'<base href="{base_url}">' + content
-        
-        return Response(content=content, media_type=content_type)
-    
-    return FileResponse(file_full_path, media_type=content_type)
+
+    # Conditional GET: an mtime+size ETag lets repeat fetches from the
+    # preview iframe come back 304 without touching the file body
+    st = os.stat(file_full_path)
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304)
+
+    # HTML already has its <base> tag injected at upload time, so every
+    # file type goes through FileResponse (zero-copy sendfile)
+    return FileResponse(file_full_path, media_type=content_type, headers={"ETag": etag})
 
 @api_router.get("/apps/{app_id}/content/{file_path:path}")
 async def get_file_content(app_id: str, file_path: str):
     """Get the raw content of a file for viewing."""
-    app = await db.apps.find_one({"id": app_id}, {"_id": 0})
-    if not app:
+    if app_id not in KNOWN_APPS:
         raise HTTPException(status_code=404, detail="App not found")
-    
-    app_dir = UPLOAD_DIR / app_id
-    file_full_path = app_dir / file_path
-    
-    # Security check
-    try:
-        file_full_path.resolve().relative_to(app_dir.resolve())
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+
+    file_full_path, content_type = _resolve(app_id, file_path)
+
     if not file_full_path.exists() or file_full_path.is_dir():
         raise HTTPException(status_code=404, detail="File not found")
-    
+
     # Check if it's a text file
-    content_type, _ = mimetypes.guess_type(str(file_full_path))
     text_types = ['text/', 'application/json', 'application/javascript', 'application/xml']
     
     is_text = content_type and any(t in content_type for t in text_types)
-    
+
     if is_text:
+        # Large files (minified bundles etc.) are streamed in chunks so
+        # neither the file body nor its JSON-escaped copy sits in memory
+        if file_full_path.stat().st_size > LARGE_TEXT_THRESHOLD:
+            return StreamingResponse(
+                _aiter_text(file_full_path, LARGE_TEXT_THRESHOLD),
+                media_type='text/plain'
+            )
         try:
-            with open(file_full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # Async read so a large file doesn't block the event loop
+            async with aiofiles.open(file_full_path, 'r', encoding='utf-8') as f:
+                content = await f.read()
             return {"content": content, "type": "text"}
         except:
             pass
@@ -349,6 +779,8 @@ async def get_file_content(app_id: str, file_path: str):
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -364,6 +796,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Lookups key on the UUID id field, not Mongo's _id; without this
+    # index every find_one is a collection scan
+    await db.apps.create_index("id", unique=True)
+
+@app.on_event("startup")
+async def load_known_apps():
+    KNOWN_APPS.update(await db.apps.distinct("id"))
+
+@app.on_event("startup")
+async def migrate_base_tags():
+    # Apps uploaded before the upload-time rewrite existed were only
+    # ever rewritten per request; give their HTML the <base> tag now.
+    # The injection skips files that already carry the tag, so this is
+    # a no-op for anything uploaded since.
+    def _migrate():
+        for entry in os.scandir(UPLOAD_DIR):
+            if entry.is_dir():
+                _inject_base_tags(Path(entry.path), entry.name)
+    await asyncio.to_thread(_migrate)
+
+@app.on_event("startup")
+async def start_insert_flusher():
+    # Keep a reference so the task isn't garbage collected
+    app.state.insert_flusher = asyncio.create_task(_insert_flusher())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def shutdown_extract_pool():
+    if _EXTRACT_POOL is not None:
+        _EXTRACT_POOL.shutdown()
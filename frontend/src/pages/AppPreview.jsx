@@ -132,7 +132,12 @@ export default function AppPreview() {
     
     try {
       const response = await axios.get(`${API}/apps/${appId}/content/${file.path}`);
-      setFileContent(response.data);
+      // Large files are streamed as plain text instead of the
+      // {content, type} envelope; normalize so the viewer renders both
+      const data = typeof response.data === 'string'
+        ? { content: response.data, type: 'text' }
+        : response.data;
+      setFileContent(data);
     } catch (error) {
       setFileContent({ type: 'error', message: 'Failed to load file' });
     }